@@ -2,12 +2,13 @@ import streamlit as st
 import json
 from hashlib import sha256
 from chatbot import Chatbot
-from database import Database
+from database import Database, SnapshotScheduler
 from student import Student
 import time
 import random
 import pandas as pd
 import io
+from datetime import timedelta
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -50,7 +51,18 @@ input, textarea {border-radius:6px !important;}
 """, unsafe_allow_html=True)
 
 # ---------------- INITIALIZE ----------------
-db = Database()
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_INTERVAL_SECONDS = 15*60
+
+@st.cache_resource
+def start_snapshot_scheduler():
+    # One scheduler per server process, shared by all sessions
+    scheduler = SnapshotScheduler("student_db.sqlite", SNAPSHOT_DIR, SNAPSHOT_INTERVAL_SECONDS)
+    scheduler.start()
+    return scheduler
+
+db = Database(snapshot_dir=SNAPSHOT_DIR, report_from_snapshot=True)
+snapshot_scheduler = start_snapshot_scheduler()
 chatbot = Chatbot(db)
 greetings = [
     "Hello! How can I assist you today? 😊",
@@ -135,12 +147,20 @@ def logout_button():
     st.rerun()
 
 # ---------------- ADMIN DASHBOARD ----------------
+def snapshot_age_caption():
+    staleness = db.get_snapshot_metrics()["staleness_seconds"]
+    if staleness is None:
+        st.caption("📡 Live data (no snapshot taken yet).")
+    else:
+        st.caption(f"🗃️ Data as of the snapshot taken {staleness/60:.0f} min ago. Take a new one from 🗃️ Snapshots for up-to-date figures.")
+
 def Admin_Dashboard():
     st.markdown("<h2>⚙️ Admin Dashboard</h2>", unsafe_allow_html=True)
     action = st.radio("Select Action", [
         "➕ Add Student", "📖 View Students", "🔍 Search Students", 
         "✏️ Update Student", "🗑️ Delete Student", "🗑️ Bulk Delete", 
-        "📈 Statistics", "💬 View Saved Chats", "🗄️ Import CSV", "💾 Export CSV"
+        "📈 Statistics", "💬 View Saved Chats", "🗄️ Import CSV", "💾 Export CSV",
+        "📜 Audit Log", "🗃️ Snapshots"
     ])
 
     # ----- ADD STUDENT -----
@@ -152,8 +172,8 @@ def Admin_Dashboard():
             query = f"add student {name} {age} {grade}"
             response = chatbot.handle_queries(query)
             st.success(response)
-            db.save_chat(st.session_state.username,"user",query)
-            db.save_chat(st.session_state.username,"assistant",response)
+            db.save_chat(st.session_state.username,"user",query,role="user")
+            db.save_chat(st.session_state.username,"assistant",response,role="assistant")
 
     # ----- VIEW STUDENTS -----
     elif action=="📖 View Students":
@@ -189,8 +209,8 @@ def Admin_Dashboard():
                 query = f"update student {student_id} {new_name} {new_age} {new_grade}"
                 response = chatbot.handle_queries(query)
                 st.success(response)
-                db.save_chat(st.session_state.username,"user",query)
-                db.save_chat(st.session_state.username,"assistant",response)
+                db.save_chat(st.session_state.username,"user",query,role="user")
+                db.save_chat(st.session_state.username,"assistant",response,role="assistant")
         else:
             st.error("Student not found")
 
@@ -201,35 +221,30 @@ def Admin_Dashboard():
             query = f"delete student {student_id}"
             response = chatbot.handle_queries(query)
             st.success(response)
-            db.save_chat(st.session_state.username,"user",query)
-            db.save_chat(st.session_state.username,"assistant",response)
+            db.save_chat(st.session_state.username,"user",query,role="user")
+            db.save_chat(st.session_state.username,"assistant",response,role="assistant")
 
     # ----- BULK DELETE -----
     elif action=="🗑️ Bulk Delete":
         grade_filter = st.text_input("Delete students with Grade (leave empty for all)")
         if st.button("Delete All"):
             students = db.get_all_students()
-            deleted = 0
-            for s in students:
-                if not grade_filter or s.grade==grade_filter:
-                    query = f"delete student {s.id}"
-                    chatbot.handle_queries(query)
-                    deleted+=1
+            ids = [s.student_id for s in students if not grade_filter or s.grade==grade_filter]
+            deleted = db.delete_students(ids, admin_user=st.session_state.username)
             st.success(f"Deleted {deleted} students.")
 
     # ----- STATISTICS -----
     elif action=="📈 Statistics":
-        students = db.get_all_students()
-        total = len(students)
-        grade_count = {}
-        for s in students:
-            grade_count[s.grade] = grade_count.get(s.grade,0)+1
+        snapshot_age_caption()
+        grade_count = db.get_student_count_per_grade(reporting=True)
+        total = sum(grade_count.values())
         st.write(f"Total Students: {total}")
         st.bar_chart(pd.DataFrame(list(grade_count.items()),columns=["Grade","Count"]))
 
     # ----- VIEW CHATS -----
     elif action=="💬 View Saved Chats":
-        chats = db.get_all_chats()
+        snapshot_age_caption()
+        chats = db.get_all_chats(reporting=True)
         if chats:
             for chat in chats[::-1]:
                 st.markdown(f"**{chat[1]}** ({chat[2]}): {chat[3]}")
@@ -239,33 +254,127 @@ def Admin_Dashboard():
     # ----- IMPORT CSV -----
     elif action=="🗄️ Import CSV":
         uploaded_file = st.file_uploader("Upload CSV",type=["csv"])
-        if uploaded_file:
-            df = pd.read_csv(uploaded_file)
-            for _,row in df.iterrows():
-                chatbot.handle_queries(f"add student {row['name']} {row['age']} {row['grade']}")
-            st.success("CSV Imported!")
+        mode = st.radio("Import mode",["Append","Sync (update roster to match file)"])
+        if mode!="Append":
+            st.caption(f"Students are matched on {' + '.join(Database.NATURAL_KEY)}. Every row needs an external_id; students without one are never changed by a sync.")
+            delete_missing = st.checkbox("Delete students missing from the file",value=True)
+        if uploaded_file and st.button("🗄️ Import"):
+            df = pd.read_csv(uploaded_file,dtype={"external_id":str})
+            if "external_id" not in df.columns:
+                df["external_id"] = ""
+            df["external_id"] = df["external_id"].fillna("")
+            students, invalid_rows = [], []
+            for i,row in df.iterrows():
+                age = pd.to_numeric(row.get('age'),errors="coerce")
+                if pd.isna(row.get('name')) or pd.isna(row.get('grade')) or pd.isna(age) or age!=int(age):
+                    invalid_rows.append(i+2)  # +2: header line and 1-based numbering
+                    continue
+                students.append(Student(name=str(row['name']), age=int(age), grade=str(row['grade']), external_id=row['external_id']))
+            if invalid_rows:
+                st.error(f"Missing or invalid name, age or grade on line(s) {', '.join(map(str,invalid_rows))}. Nothing was imported.")
+            elif mode=="Append":
+                added = db.insert_students(students, admin_user=st.session_state.username)
+                skipped = len(students)-len(added)
+                st.success(f"CSV Imported! Added {len(added)} students" + (f", skipped {skipped} already present." if skipped else "."))
+            else:
+                try:
+                    counts = db.sync_students(students, admin_user=st.session_state.username, delete_missing=delete_missing)
+                    st.success(f"Roster synced: {counts['inserted']} added, {counts['updated']} updated, {counts['deleted']} deleted, {counts['unchanged']} unchanged.")
+                except ValueError as e:
+                    st.error(str(e))
 
     # ----- EXPORT CSV -----
     elif action=="💾 Export CSV":
-        students = db.get_all_students()
+        snapshot_age_caption()
+        students = db.get_all_students(reporting=True)
         df = pd.DataFrame([vars(s) for s in students])
         csv = df.to_csv(index=False)
         st.download_button("Download CSV", csv, "students.csv","text/csv")
 
+    # ----- AUDIT LOG -----
+    elif action=="📜 Audit Log":
+        daily = db.get_daily_action_counts()
+        if daily:
+            chart = pd.DataFrame(daily,columns=["Day","Admin","Actions"]).pivot(index="Day",columns="Admin",values="Actions").fillna(0)
+            st.bar_chart(chart)
+        col1, col2, col3 = st.columns(3)
+        admin_filter = col1.selectbox("Admin",["All"]+db.get_audit_admins())
+        action_filter = col2.text_input("Action (e.g. delete_student)")
+        target_filter = col3.number_input("Target ID (0 for any)",min_value=0,step=1,help="Also matches bulk entries whose ID ranges include this student")
+        col4, col5, col6 = st.columns(3)
+        since = col4.date_input("Since",value=None)
+        until = col5.date_input("Until",value=None)
+        page_size = 50
+        page_number = col6.number_input("Page",min_value=1,step=1)
+        logs = db.query_audit(
+            admin=None if admin_filter=="All" else admin_filter,
+            action=action_filter or None,
+            target_id=target_filter or None,
+            since=since,
+            until=until + timedelta(days=1) if until else None,
+            limit=page_size,
+            offset=(page_number-1)*page_size,
+        )
+        if logs:
+            st.table(pd.DataFrame(logs,columns=["ID","Admin","Action","Target ID","Details","Items","Timestamp"]))
+        else:
+            st.info("No audit log entries found.")
+
+    # ----- SNAPSHOTS -----
+    elif action=="🗃️ Snapshots":
+        st.caption(f"Statistics, exports and saved chats are read from the latest snapshot, taken every {SNAPSHOT_INTERVAL_SECONDS//60} minutes.")
+        if st.button("📸 Take Snapshot Now"):
+            db.snapshot()
+            st.success("Snapshot taken.")
+        metrics = db.get_snapshot_metrics()
+        scheduler_metrics = snapshot_scheduler.get_metrics()
+        col1, col2, col3 = st.columns(3)
+        staleness = metrics["staleness_seconds"]
+        col1.metric("Staleness", f"{staleness:.0f} s" if staleness is not None else "No snapshot")
+        duration = metrics["last_duration_seconds"] or scheduler_metrics.get("last_duration_seconds")
+        col2.metric("Last Duration", f"{duration*1000:.0f} ms" if duration is not None else "-")
+        col3.metric("Scheduled Snapshots", scheduler_metrics.get("snapshots_taken",0))
+        if metrics["latest_snapshot_path"]:
+            st.write(f"Latest snapshot: `{metrics['latest_snapshot_path']}`")
+        if scheduler_metrics.get("last_error"):
+            st.error(f"Last scheduled snapshot failed: {scheduler_metrics['last_error']}")
+
 
 # ---------------- USER DASHBOARD ----------------
-def User_Dashboard():
-    st.markdown("<h2>💬 Chat Interface</h2>", unsafe_allow_html=True)
-    if "messages" not in st.session_state:
-        st.session_state.messages=[]
-    if not st.session_state.messages:
-        st.session_state.messages.append({"role":"assistant","content":random.choice(greetings)})
+CHAT_WINDOW = 30
+CHAT_PAGE_SIZE = 30
+
+def message_from_row(row):
+    return {"id":row[0],"role":row[1],"content":row[2]}
+
+def render_message(msg):
+    with st.chat_message(msg["role"]):
+        st.markdown(msg["content"])
+
+def oldest_message_id():
+    ids = [m["id"] for m in st.session_state.older_messages+st.session_state.messages if m.get("id")]
+    return min(ids) if ids else None
+
+@st.fragment
+def older_chat_history():
+    if st.session_state.older_messages:
+        for msg in st.session_state.older_messages:
+            render_message(msg)
+        st.divider()
+    if st.button("⬆️ Load older messages"):
+        rows = db.get_chat_messages(st.session_state.username,limit=CHAT_PAGE_SIZE,before_id=oldest_message_id())
+        if rows:
+            st.session_state.older_messages = [message_from_row(r) for r in reversed(rows)]+st.session_state.older_messages
+            st.rerun(scope="fragment")
+        else:
+            st.info("No older messages.")
+
+@st.fragment
+def chat_window():
     for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+        render_message(msg)
     query = st.chat_input("Enter your message here...")
     if query:
-        st.session_state.messages.append({"role":"user","content":query})
         with st.chat_message("user"):
             st.markdown(query)
         with st.chat_message("assistant"):
@@ -274,9 +383,29 @@ def User_Dashboard():
                 time.sleep(1.5)
                 response = chatbot.handle_queries(query)
             placeholder.markdown(response)
-            st.session_state.messages.append({"role":"assistant","content":response})
-            db.save_chat(st.session_state.username,"user",query)
-            db.save_chat(st.session_state.username,"assistant",response)
+        messages = st.session_state.messages
+        messages.append({"role":"user","content":query,"id":db.save_chat(st.session_state.username,"user",query,role="user")})
+        messages.append({"role":"assistant","content":response,"id":db.save_chat(st.session_state.username,"assistant",response,role="assistant")})
+        if len(messages)>CHAT_WINDOW:
+            # Trimmed messages stay in the chats table and the next fragment run drops them
+            del messages[:-CHAT_WINDOW]
+            if st.session_state.older_messages:
+                # Loaded history is no longer contiguous; the history fragment only
+                # redraws on a full rerun
+                st.session_state.older_messages = []
+                st.rerun()
+
+def User_Dashboard():
+    st.markdown("<h2>💬 Chat Interface</h2>", unsafe_allow_html=True)
+    if "messages" not in st.session_state:
+        rows = db.get_chat_messages(st.session_state.username,limit=CHAT_WINDOW)
+        st.session_state.messages = [message_from_row(r) for r in reversed(rows)]
+    if "older_messages" not in st.session_state:
+        st.session_state.older_messages=[]
+    if not st.session_state.messages:
+        st.session_state.messages.append({"role":"assistant","content":random.choice(greetings)})
+    older_chat_history()
+    chat_window()
 
 
 # ---------------- MAIN ----------------
@@ -288,6 +417,7 @@ if 'page' not in st.session_state:
 page = st.sidebar.radio("Go to", ["Login","Register"], index=0 if st.session_state.page=="Login" else 1)
 if st.sidebar.button("🧹 Clear Conversation"):
     st.session_state.messages=[]
+    st.session_state.older_messages=[]
 if st.sidebar.button("🚪 Logout"):
     logout_button()
 if not st.session_state.logged_in:
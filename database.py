@@ -1,12 +1,53 @@
 from student import Student
 import sqlite3
-from datetime import datetime
+import hashlib
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+class _BackupRestarted(Exception):
+    """Raised from the backup progress callback when writers keep restarting a paged backup"""
 
 class Database:
-    def __init__(self, db_name="student_db.sqlite"):
-        """Initialize the database and create tables if they don't exist"""
+    # Natural key of students imported from the registrar feed. It is unique only
+    # among students that have an external_id; students added by hand have none.
+    NATURAL_KEY = ("name", "external_id")
+
+    # Longest ID range stored per audit_target_ranges row
+    AUDIT_RANGE_SPAN = 1000
+
+    # Snapshot settings: pages copied per backup step, restarts tolerated before
+    # finishing in a single step, snapshots kept on disk, and mmap size for reports
+    SNAPSHOT_PAGES = 256
+    SNAPSHOT_MAX_RESTARTS = 3
+    SNAPSHOT_KEEP = 3
+    REPORT_MMAP_SIZE = 256 * 1024 * 1024
+    SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+    def __init__(self, db_name="student_db.sqlite", snapshot_dir=None, report_from_snapshot=False):
+        """Initialize the database and create tables if they don't exist
+
+        With `report_from_snapshot`, read methods called with `reporting=True` are
+        served from the latest snapshot in `snapshot_dir` instead of the live database.
+        """
+        self._db_name = db_name
+        self._snapshot_dir = snapshot_dir
+        self._report_from_snapshot = report_from_snapshot
+        self._report_connection = None
+        self._report_snapshot_path = None
+        self._snapshot_metrics = {
+            "snapshots_taken": 0,
+            "last_duration_seconds": None,
+            "last_restarts": 0,
+            "last_snapshot_path": None,
+            "last_snapshot_at": None,
+        }
         self._connection = sqlite3.connect(db_name)
         self._cursor = self._connection.cursor()
+        # WAL lets snapshots and reports read while chats and admin actions keep writing
+        self._cursor.execute("PRAGMA journal_mode=WAL")
         self._create_student_table()
         self._create_chat_table()
         self._create_audit_table()
@@ -20,10 +61,21 @@ class Database:
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             age INTEGER NOT NULL,
-            grade TEXT NOT NULL
+            grade TEXT NOT NULL,
+            external_id TEXT NOT NULL DEFAULT '',
+            row_hash TEXT
         );
         '''
         self._cursor.execute(query)
+        self._add_column_if_missing("students", "external_id", "TEXT NOT NULL DEFAULT ''")
+        self._add_column_if_missing("students", "row_hash", "TEXT")
+        # Per-sync key indexes created by an earlier version, superseded by the one below
+        for index in ("idx_students_name", "idx_students_external_id", "idx_students_name_external_id"):
+            self._cursor.execute(f"DROP INDEX IF EXISTS {index}")
+        self._cursor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_students_natural_key ON students ({', '.join(self.NATURAL_KEY)}) "
+            "WHERE external_id != ''"
+        )
         self._connection.commit()
 
     def _create_chat_table(self):
@@ -34,10 +86,23 @@ class Database:
             user TEXT NOT NULL,
             message TEXT NOT NULL,
             response TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            role TEXT
         );
         '''
         self._cursor.execute(query)
+        if self._add_column_if_missing("chats", "role", "TEXT"):
+            # Older versions stored the chat interface's role in `message`. A chatbot row whose
+            # query was literally "user"/"assistant" is told apart by the role row saved right after it
+            self._cursor.execute('''
+            UPDATE chats SET role = message
+            WHERE message IN ('user', 'assistant') AND NOT EXISTS (
+                SELECT 1 FROM chats AS next_chat
+                WHERE next_chat.id = chats.id + 1 AND next_chat.user = chats.user
+                AND next_chat.message = 'user' AND next_chat.response = chats.message
+            )
+            ''')
+        self._cursor.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats (user, id)")
         self._connection.commit()
 
     def _create_audit_table(self):
@@ -52,62 +117,229 @@ class Database:
         );
         '''
         self._cursor.execute(query)
+        self._add_column_if_missing("audit_logs", "details", "TEXT")
+        self._add_column_if_missing("audit_logs", "item_count", "INTEGER NOT NULL DEFAULT 1")
+        self._cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_admin_ts ON audit_logs (admin_user, timestamp)"
+        )
+        self._cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_action_ts ON audit_logs (action, timestamp)"
+        )
+        self._cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_target_ts ON audit_logs (target_id, timestamp)"
+        )
         self._connection.commit()
+        self._create_audit_target_range_table()
+        self._create_audit_rollup_table()
+
+    def _create_audit_target_range_table(self):
+        """Create the table of ID ranges covered by batch audit entries"""
+        query = '''
+        CREATE TABLE IF NOT EXISTS audit_target_ranges (
+            audit_id INTEGER NOT NULL REFERENCES audit_logs (id),
+            start_id INTEGER NOT NULL,
+            end_id INTEGER NOT NULL
+        );
+        '''
+        self._cursor.execute(query)
+        # Superseded by the covering index below
+        self._cursor.execute("DROP INDEX IF EXISTS idx_audit_ranges_start_end")
+        self._cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_ranges_lookup ON audit_target_ranges (start_id, end_id, audit_id)"
+        )
+        self._connection.commit()
+
+    def _create_audit_rollup_table(self):
+        """Create the daily rollup of admin actions, backfilling it from existing logs"""
+        query = '''
+        CREATE TABLE IF NOT EXISTS audit_daily_rollup (
+            day TEXT NOT NULL,
+            admin_user TEXT NOT NULL,
+            action_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, admin_user)
+        );
+        '''
+        self._cursor.execute(query)
+        self._cursor.execute("SELECT 1 FROM audit_daily_rollup LIMIT 1")
+        if self._cursor.fetchone() is None:
+            self._cursor.execute('''
+            INSERT INTO audit_daily_rollup (day, admin_user, action_count)
+            SELECT date(timestamp), admin_user, SUM(item_count)
+            FROM audit_logs
+            GROUP BY date(timestamp), admin_user
+            ''')
+        self._connection.commit()
+
+    def _add_column_if_missing(self, table, column, definition):
+        """Add a column to an existing table created by an older version of the schema"""
+        self._cursor.execute(f"PRAGMA table_info({table})")
+        if column in [row[1] for row in self._cursor.fetchall()]:
+            return False
+        self._cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
 
     # -------------------- Student Methods --------------------
 
     def insert_student(self, student: Student, admin_user=None):
-        """Insert a student record into the database"""
-        query = "INSERT INTO students (name, age, grade) VALUES (?, ?, ?)"
-        self._cursor.execute(query, (student.name, student.age, student.grade))
-        self._connection.commit()
+        """Insert a student record into the database
+
+        Returns None without inserting if a student with the same natural key exists.
+        """
+        query = "INSERT INTO students (name, age, grade, external_id) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING"
+        self._cursor.execute(query, (student.name, student.age, student.grade, student.external_id or ""))
+        if self._cursor.rowcount == 0:
+            # End the implicit write transaction so other connections aren't locked out
+            self._connection.commit()
+            return None
         student_id = self._cursor.lastrowid
         student.student_id = student_id
 
         if admin_user:
-            self.log_action(admin_user, "insert_student", student_id)
+            self.log_action(admin_user, "insert_student", student_id, commit=False)
+        self._connection.commit()
         return student_id
 
-    def get_all_students(self):
+    def insert_students(self, students, admin_user=None):
+        """Insert many students in one transaction with a single batch audit entry
+
+        Students whose natural key already exists are skipped; returns the new IDs.
+        """
+        query = "INSERT INTO students (name, age, grade, external_id) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING"
+        student_ids = []
+        for student in students:
+            self._cursor.execute(query, (student.name, student.age, student.grade, student.external_id or ""))
+            if self._cursor.rowcount == 0:
+                continue
+            student.student_id = self._cursor.lastrowid
+            student_ids.append(student.student_id)
+
+        if admin_user and student_ids:
+            self.log_bulk_action(admin_user, "bulk_insert_student", student_ids, commit=False)
+        self._connection.commit()
+        return student_ids
+
+    def get_all_students(self, reporting=False):
         """Return all students as a list of Student objects"""
-        query = "SELECT * FROM students"
-        self._cursor.execute(query)
-        rows = self._cursor.fetchall()
-        return [Student(student_id=row[0], name=row[1], age=row[2], grade=row[3]) for row in rows]
+        cursor = self._report_cursor() if reporting else self._cursor
+        query = "SELECT id, name, age, grade, external_id FROM students"
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        return [Student(student_id=row[0], name=row[1], age=row[2], grade=row[3], external_id=row[4]) for row in rows]
 
     def get_student_by_id(self, student_id):
         """Fetch student by ID"""
-        query = "SELECT * FROM students WHERE id = ?"
+        query = "SELECT id, name, age, grade, external_id FROM students WHERE id = ?"
         self._cursor.execute(query, (student_id,))
         row = self._cursor.fetchone()
         if row:
-            return Student(student_id=row[0], name=row[1], age=row[2], grade=row[3])
+            return Student(student_id=row[0], name=row[1], age=row[2], grade=row[3], external_id=row[4])
         return None
 
     def get_student_by_name(self, student_name):
         """Fetch student by name"""
-        query = "SELECT * FROM students WHERE name = ?"
+        query = "SELECT id, name, age, grade, external_id FROM students WHERE name = ?"
         self._cursor.execute(query, (student_name,))
         row = self._cursor.fetchone()
         if row:
-            return Student(student_id=row[0], name=row[1], age=row[2], grade=row[3])
+            return Student(student_id=row[0], name=row[1], age=row[2], grade=row[3], external_id=row[4])
         return None
 
     def update_student(self, student: Student, admin_user=None):
         """Update a student's information"""
-        query = "UPDATE students SET name = ?, age = ?, grade = ? WHERE id = ?"
+        # Clearing row_hash makes the next sync_students rewrite this row
+        query = "UPDATE students SET name = ?, age = ?, grade = ?, row_hash = NULL WHERE id = ?"
         self._cursor.execute(query, (student.name, student.age, student.grade, student.student_id))
-        self._connection.commit()
         if admin_user:
-            self.log_action(admin_user, "update_student", student.student_id)
+            self.log_action(admin_user, "update_student", student.student_id, commit=False)
+        self._connection.commit()
 
     def delete_student(self, student_id, admin_user=None):
         """Delete student by ID"""
         query = "DELETE FROM students WHERE id = ?"
         self._cursor.execute(query, (student_id,))
-        self._connection.commit()
         if admin_user:
-            self.log_action(admin_user, "delete_student", student_id)
+            self.log_action(admin_user, "delete_student", student_id, commit=False)
+        self._connection.commit()
+
+    def delete_students(self, student_ids, admin_user=None):
+        """Delete many students in one transaction with a single batch audit entry"""
+        student_ids = list(student_ids)
+        query = "DELETE FROM students WHERE id = ?"
+        self._cursor.executemany(query, [(student_id,) for student_id in student_ids])
+        if admin_user and student_ids:
+            self.log_bulk_action(admin_user, "bulk_delete_student", student_ids, commit=False)
+        self._connection.commit()
+        return len(student_ids)
+
+    def sync_students(self, students, admin_user=None, delete_missing=True):
+        """Make the keyed students match the given roster, touching only changed rows
+
+        Rows are matched on NATURAL_KEY and compared by row hash. Only students
+        with an external_id take part, so students added by hand are left alone.
+        Inserts, updates and deletes are applied in one transaction and a dict
+        with the counts of each is returned.
+        """
+        incoming = {}
+        duplicates = set()
+        for student in students:
+            if not student.external_id:
+                raise ValueError(f"Student {student.name} has no external_id; every synced row needs one")
+            student_key = tuple(getattr(student, column) for column in self.NATURAL_KEY)
+            if student_key in incoming:
+                duplicates.add(student_key)
+            incoming[student_key] = student
+        if duplicates:
+            listed = ", ".join(" / ".join(str(part) for part in student_key) for student_key in sorted(duplicates))
+            raise ValueError(f"The file lists these students more than once: {listed}")
+
+        key_columns = ", ".join(self.NATURAL_KEY)
+        self._cursor.execute(f"SELECT id, row_hash, {key_columns} FROM students WHERE external_id != ''")
+        existing = {tuple(row[2:]): (row[0], row[1]) for row in self._cursor.fetchall()}
+
+        changed = []
+        inserted = 0
+        for student_key, student in incoming.items():
+            row_hash = self._row_hash(student)
+            if student_key not in existing:
+                inserted += 1
+            elif existing[student_key][1] == row_hash:
+                continue
+            changed.append((student.name, student.age, student.grade, student.external_id, row_hash))
+        deleted_ids = [row[0] for student_key, row in existing.items() if student_key not in incoming] \
+            if delete_missing else []
+
+        upsert_query = f'''
+        INSERT INTO students (name, age, grade, external_id, row_hash) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT ({key_columns}) WHERE external_id != '' DO UPDATE SET
+            age = excluded.age, grade = excluded.grade, row_hash = excluded.row_hash
+        RETURNING id
+        '''
+        try:
+            upserted_ids = []
+            for row in changed:
+                self._cursor.execute(upsert_query, row)
+                upserted_ids.append(self._cursor.fetchone()[0])
+            self._cursor.executemany("DELETE FROM students WHERE id = ?", [(i,) for i in deleted_ids])
+            if admin_user and upserted_ids:
+                self.log_bulk_action(admin_user, "sync_upsert_student", upserted_ids, commit=False)
+            if admin_user and deleted_ids:
+                self.log_bulk_action(admin_user, "sync_delete_student", deleted_ids, commit=False)
+            self._connection.commit()
+        except sqlite3.Error:
+            self._connection.rollback()
+            raise
+        return {
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "deleted": len(deleted_ids),
+            "unchanged": len(incoming) - len(changed),
+        }
+
+    @staticmethod
+    def _row_hash(student):
+        """Hash the synced fields of a student so unchanged rows can be skipped"""
+        fields = (student.name, student.age, student.grade, student.external_id or "")
+        return hashlib.sha256("\x1f".join(str(field) for field in fields).encode()).hexdigest()
 
     def get_all_grades(self):
         """Return distinct grades from the students table"""
@@ -118,34 +350,87 @@ class Database:
 
     # -------------------- Report Methods --------------------
 
-    def get_student_count_per_grade(self):
+    def get_student_count_per_grade(self, reporting=False):
         """Return a dictionary of student count per grade"""
+        cursor = self._report_cursor() if reporting else self._cursor
         query = "SELECT grade, COUNT(*) FROM students GROUP BY grade"
-        self._cursor.execute(query)
-        rows = self._cursor.fetchall()
+        cursor.execute(query)
+        rows = cursor.fetchall()
         return {row[0]: row[1] for row in rows}
 
     # -------------------- Chat Methods --------------------
 
-    def save_chat(self, user, message, response):
-        """Save a user chat with the assistant"""
-        query = "INSERT INTO chats (user, message, response) VALUES (?, ?, ?)"
-        self._cursor.execute(query, (user, message, response))
+    def save_chat(self, user, message, response, role=None):
+        """Save a user chat with the assistant
+
+        Rows saved with a `role` make up the chat transcript shown to the user.
+        """
+        query = "INSERT INTO chats (user, message, response, role) VALUES (?, ?, ?, ?)"
+        self._cursor.execute(query, (user, message, response, role))
         self._connection.commit()
+        return self._cursor.lastrowid
 
-    def get_all_chats(self):
+    def get_all_chats(self, reporting=False):
         """Fetch all chats, newest first"""
+        cursor = self._report_cursor() if reporting else self._cursor
         query = "SELECT * FROM chats ORDER BY timestamp DESC"
-        self._cursor.execute(query)
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    def get_chat_messages(self, user, limit=50, before_id=None):
+        """Fetch a page of a user's chat messages as (id, role, content), newest first"""
+        query = '''
+        SELECT id, role, response FROM chats
+        WHERE user = ? AND role IS NOT NULL
+        '''
+        params = [user]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        self._cursor.execute(query, params + [limit])
         return self._cursor.fetchall()
 
     # -------------------- Audit Log Methods --------------------
 
-    def log_action(self, admin_user, action, target_id=None):
-        """Record an admin action in the audit logs"""
-        query = "INSERT INTO audit_logs (admin_user, action, target_id) VALUES (?, ?, ?)"
-        self._cursor.execute(query, (admin_user, action, target_id))
-        self._connection.commit()
+    def log_action(self, admin_user, action, target_id=None, details=None, item_count=1, commit=True):
+        """Record an admin action in the audit logs and bump the daily rollup"""
+        query = '''
+        INSERT INTO audit_logs (admin_user, action, target_id, details, item_count)
+        VALUES (?, ?, ?, ?, ?)
+        '''
+        self._cursor.execute(query, (admin_user, action, target_id, details, item_count))
+        audit_id = self._cursor.lastrowid
+        rollup_query = '''
+        INSERT INTO audit_daily_rollup (day, admin_user, action_count)
+        SELECT date(timestamp), admin_user, item_count FROM audit_logs WHERE id = ?
+        ON CONFLICT (day, admin_user) DO UPDATE SET action_count = action_count + excluded.action_count
+        '''
+        self._cursor.execute(rollup_query, (audit_id,))
+        if commit:
+            self._connection.commit()
+        return audit_id
+
+    def log_bulk_action(self, admin_user, action, target_ids, commit=True):
+        """Record a batch of admin actions as one entry holding the compacted ID ranges"""
+        target_ids = sorted(set(target_ids))
+        target_id = target_ids[0] if len(target_ids) == 1 else None
+        ranges = self._id_ranges(target_ids)
+        audit_id = self.log_action(admin_user, action, target_id, details=self._compact_ids(ranges),
+                                   item_count=len(target_ids), commit=False)
+        # Ranges are indexed separately so query_audit(target_id=...) finds batch entries too.
+        # They are split into AUDIT_RANGE_SPAN-sized pieces so a lookup scans a bounded slice.
+        self._cursor.executemany(
+            "INSERT INTO audit_target_ranges (audit_id, start_id, end_id) VALUES (?, ?, ?)",
+            [
+                (audit_id, piece_start, min(piece_start + self.AUDIT_RANGE_SPAN - 1, end))
+                for start, end in ranges
+                for piece_start in range(start, end + 1, self.AUDIT_RANGE_SPAN)
+            ],
+        )
+        if commit:
+            self._connection.commit()
+        return audit_id
 
     def get_audit_logs(self):
         """Fetch all audit logs"""
@@ -153,10 +438,195 @@ class Database:
         self._cursor.execute(query)
         return self._cursor.fetchall()
 
+    def query_audit(self, admin=None, action=None, target_id=None, since=None, until=None,
+                    limit=50, offset=0):
+        """Fetch a page of audit logs matching the given filters, newest first"""
+        conditions = []
+        params = []
+        if admin:
+            conditions.append("admin_user = ?")
+            params.append(admin)
+        if action:
+            conditions.append("action = ?")
+            params.append(action)
+        if target_id is not None:
+            conditions.append('''id IN (
+                SELECT id FROM audit_logs WHERE target_id = ?
+                UNION
+                SELECT audit_id FROM audit_target_ranges
+                WHERE start_id BETWEEN ? AND ? AND end_id >= ?
+            )''')
+            params.extend([target_id, target_id - self.AUDIT_RANGE_SPAN + 1, target_id, target_id])
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(self._format_timestamp(since))
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(self._format_timestamp(until))
+
+        query = "SELECT id, admin_user, action, target_id, details, item_count, timestamp FROM audit_logs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        self._cursor.execute(query, params + [limit, offset])
+        return self._cursor.fetchall()
+
+    def get_audit_admins(self):
+        """Return the distinct admin users that appear in the audit logs"""
+        query = "SELECT DISTINCT admin_user FROM audit_daily_rollup ORDER BY admin_user"
+        self._cursor.execute(query)
+        return [row[0] for row in self._cursor.fetchall()]
+
+    def get_daily_action_counts(self, since=None):
+        """Return (day, admin_user, action_count) rows from the daily rollup"""
+        query = "SELECT day, admin_user, action_count FROM audit_daily_rollup"
+        params = []
+        if since is not None:
+            query += " WHERE day >= ?"
+            params.append(self._format_timestamp(since)[:10])
+        query += " ORDER BY day, admin_user"
+        self._cursor.execute(query, params)
+        return self._cursor.fetchall()
+
+    @staticmethod
+    def _format_timestamp(value):
+        """Format a date/datetime the way SQLite's CURRENT_TIMESTAMP stores it"""
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, date):
+            return value.strftime("%Y-%m-%d")
+        return str(value)
+
+    @staticmethod
+    def _id_ranges(ids):
+        """Group sorted IDs into [start, end] runs, e.g. [1, 2, 3, 7] -> [[1, 3], [7, 7]]"""
+        ranges = []
+        for student_id in ids:
+            if ranges and student_id == ranges[-1][1] + 1:
+                ranges[-1][1] = student_id
+            else:
+                ranges.append([student_id, student_id])
+        return ranges
+
+    @staticmethod
+    def _compact_ids(ranges):
+        """Format ID runs as text, e.g. [[1, 3], [7, 7], [9, 10]] -> '1-3,7,9-10'"""
+        return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+    # -------------------- Snapshot Methods --------------------
+
+    def snapshot(self, snapshot_dir=None, pages=SNAPSHOT_PAGES):
+        """Write a point-in-time copy of the database using the online backup API
+
+        The copy is taken `pages` pages at a time so writers are only locked out
+        for one step. If writers restart the backup more than SNAPSHOT_MAX_RESTARTS
+        times, it is finished in a single step, which WAL mode keeps non-blocking.
+        Returns the path of the new snapshot.
+        """
+        snapshot_dir = snapshot_dir or self._snapshot_dir
+        if not snapshot_dir:
+            raise ValueError("No snapshot directory configured")
+        snapshot_dir = Path(snapshot_dir)
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > self.SNAPSHOT_MAX_RESTARTS:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+
+        # The snapshot holds at least everything committed before the backup starts,
+        # so that moment is recorded (in the file name) as its point in time
+        taken_at = datetime.now()
+        snapshot_path = snapshot_dir / f"{Path(self._db_name).stem}-{taken_at:{self.SNAPSHOT_TIME_FORMAT}}.sqlite"
+        temp_path = snapshot_path.with_suffix(".sqlite.tmp")
+        started = time.perf_counter()
+        # A dedicated source connection lets snapshots run from a scheduler thread
+        source = sqlite3.connect(self._db_name)
+        try:
+            destination = sqlite3.connect(temp_path)
+            try:
+                try:
+                    source.backup(destination, pages=pages, progress=progress)
+                except _BackupRestarted:
+                    source.backup(destination, pages=-1)
+                # Snapshots are opened read-only, which needs a rollback journal rather than WAL
+                destination.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                destination.close()
+        finally:
+            source.close()
+        os.replace(temp_path, snapshot_path)
+        duration = time.perf_counter() - started
+
+        self._snapshot_metrics["snapshots_taken"] += 1
+        self._snapshot_metrics["last_duration_seconds"] = duration
+        self._snapshot_metrics["last_restarts"] = restarts
+        self._snapshot_metrics["last_snapshot_path"] = str(snapshot_path)
+        self._snapshot_metrics["last_snapshot_at"] = taken_at
+        self._prune_snapshots(snapshot_dir)
+        return snapshot_path
+
+    def get_snapshot_metrics(self):
+        """Return snapshot timing metrics, including how stale the latest snapshot is"""
+        metrics = dict(self._snapshot_metrics)
+        latest = self._latest_snapshot_path()
+        metrics["latest_snapshot_path"] = str(latest) if latest else None
+        metrics["staleness_seconds"] = (
+            (datetime.now() - self._snapshot_taken_at(latest)).total_seconds() if latest else None
+        )
+        return metrics
+
+    def _snapshot_taken_at(self, path):
+        """Return the point in time a snapshot represents, parsed from its file name"""
+        return datetime.strptime(path.stem[len(Path(self._db_name).stem) + 1:], self.SNAPSHOT_TIME_FORMAT)
+
+    def _snapshot_paths(self, snapshot_dir=None):
+        """Return existing snapshots of this database, oldest first"""
+        snapshot_dir = snapshot_dir or self._snapshot_dir
+        if not snapshot_dir or not Path(snapshot_dir).is_dir():
+            return []
+        return sorted(Path(snapshot_dir).glob(f"{Path(self._db_name).stem}-*.sqlite"))
+
+    def _latest_snapshot_path(self):
+        """Return the newest snapshot, or None if there is none yet"""
+        paths = self._snapshot_paths()
+        return paths[-1] if paths else None
+
+    def _prune_snapshots(self, snapshot_dir):
+        """Delete all but the newest SNAPSHOT_KEEP snapshots"""
+        for path in self._snapshot_paths(snapshot_dir)[:-self.SNAPSHOT_KEEP]:
+            try:
+                path.unlink()
+            except OSError:
+                # Still open by a reporting connection (e.g. on Windows); retry next time
+                pass
+
+    def _report_cursor(self):
+        """Return a cursor on the latest read-only snapshot, or the live cursor"""
+        if not self._report_from_snapshot:
+            return self._cursor
+        latest = self._latest_snapshot_path()
+        if latest is None:
+            return self._cursor
+        if latest != self._report_snapshot_path:
+            if self._report_connection:
+                self._report_connection.close()
+            self._report_connection = sqlite3.connect(f"{latest.resolve().as_uri()}?mode=ro", uri=True)
+            self._report_connection.execute(f"PRAGMA mmap_size={self.REPORT_MMAP_SIZE}")
+            self._report_snapshot_path = latest
+        return self._report_connection.cursor()
+
     # -------------------- Cleanup --------------------
 
     def close(self):
         """Close the database connection"""
+        if self._report_connection:
+            self._report_connection.close()
         self._cursor.close()
         self._connection.close()
 
@@ -165,3 +635,44 @@ class Database:
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
+
+
+class SnapshotScheduler(threading.Thread):
+    """Background thread that snapshots a database every `interval_seconds`"""
+
+    def __init__(self, db_name, snapshot_dir, interval_seconds):
+        super().__init__(daemon=True)
+        self.db_name = db_name
+        self.snapshot_dir = snapshot_dir
+        self.interval_seconds = interval_seconds
+        self.last_error = None
+        self._db = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    # SQLite connections are tied to the thread that opened them. Opening runs
+                    # schema setup, which can hit a locked database, so retry it each interval
+                    if self._db is None:
+                        self._db = Database(self.db_name, snapshot_dir=self.snapshot_dir)
+                    self._db.snapshot()
+                    self.last_error = None
+                except (sqlite3.Error, OSError) as e:
+                    self.last_error = str(e)
+                if self._stop_event.wait(self.interval_seconds):
+                    break
+        finally:
+            if self._db is not None:
+                self._db.close()
+
+    def get_metrics(self):
+        """Return the metrics of the snapshots taken by this scheduler"""
+        metrics = self._db.get_snapshot_metrics() if self._db else {}
+        metrics["last_error"] = self.last_error
+        return metrics
+
+    def stop(self):
+        """Stop taking snapshots after the current one finishes"""
+        self._stop_event.set()
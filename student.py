@@ -1,9 +1,10 @@
 class Student:
-    def __init__(self, student_id=None, name=None, age=None, grade=None):
+    def __init__(self, student_id=None, name=None, age=None, grade=None, external_id=None):
         self.student_id = student_id
         self.name = name
         self.age = age
         self.grade = grade
+        self.external_id = external_id
 
     def update(self, name=None, age=None, grade=None):
         """Update student information if provided"""
@@ -26,6 +27,6 @@ class Student:
 
     def __repr__(self):
         """For debugging and easy printout of student object"""
-        return f"<Student(id={self.student_id}, name={self.name}, age={self.age}, grade={self.grade})>"
+        return f"<Student(id={self.student_id}, name={self.name}, age={self.age}, grade={self.grade}, external_id={self.external_id})>"
 
 